@@ -0,0 +1,220 @@
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+
+from fleet_operations import DB_FILE
+
+BACKUP_DIR = "backups"
+MAX_SNAPSHOTS = 14              # Number of compressed snapshots kept on disk
+PAGES_PER_STEP = 64             # Pages copied per backup step
+STEP_SLEEP = 0.01               # Seconds to wait before retrying a step while the database is busy or locked
+BACKUP_INTERVAL_MS = 60 * 60 * 1000  # Scheduled backup every hour
+
+SNAPSHOT_PREFIX = "fleet-"
+SNAPSHOT_SUFFIX = ".db.gz"
+TIMESTAMP_FORMAT = "%Y%m%d-%H%M%S-%f"
+
+_backup_lock = threading.RLock()
+
+
+def _copy_database(source_conn, dest_conn, pages=PAGES_PER_STEP, sleep=STEP_SLEEP):
+    """Copy one open database into another in small page steps using the SQLite backup API."""
+    source_conn.backup(dest_conn, pages=pages, sleep=sleep)
+
+
+def _decompress_to_temp(snapshot_path):
+    fd, temp_path = tempfile.mkstemp(suffix=".db")
+    with os.fdopen(fd, "wb") as out_file, gzip.open(snapshot_path, "rb") as in_file:
+        shutil.copyfileobj(in_file, out_file)
+    return temp_path
+
+
+def list_snapshots(backup_dir=BACKUP_DIR):
+    """Return snapshot paths ordered from oldest to newest."""
+    if not os.path.isdir(backup_dir):
+        return []
+    names = sorted(
+        name for name in os.listdir(backup_dir)
+        if name.startswith(SNAPSHOT_PREFIX) and name.endswith(SNAPSHOT_SUFFIX)
+    )
+    return [os.path.join(backup_dir, name) for name in names]
+
+
+def snapshot_time(snapshot_path):
+    """Return the point in time a snapshot was taken, parsed from its file name."""
+    name = os.path.basename(snapshot_path)
+    stamp = name[len(SNAPSHOT_PREFIX):-len(SNAPSHOT_SUFFIX)]
+    return datetime.strptime(stamp, TIMESTAMP_FORMAT)
+
+
+def rotate_snapshots(backup_dir=BACKUP_DIR, keep=MAX_SNAPSHOTS):
+    """Delete the oldest snapshots so that at most `keep` remain."""
+    snapshots = list_snapshots(backup_dir)
+    removed = snapshots[:-keep] if keep > 0 else snapshots
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def _database_hash(db_path):
+    """Hash of a database's schema and rows, unaffected by how its pages happen to be laid out."""
+    digest = hashlib.sha256()
+    conn = sqlite3.connect(db_path)
+    try:
+        for statement in conn.iterdump():
+            digest.update(statement.encode("utf-8"))
+    finally:
+        conn.close()
+    return digest.hexdigest()
+
+
+def _snapshot_hash(snapshot_path):
+    """_database_hash of a snapshot, or None if it cannot be read."""
+    try:
+        temp_path = _decompress_to_temp(snapshot_path)
+    except (OSError, EOFError):
+        return None
+    try:
+        return _database_hash(temp_path)
+    except sqlite3.DatabaseError:
+        return None
+    finally:
+        os.remove(temp_path)
+
+
+def create_snapshot(db_file=DB_FILE, backup_dir=BACKUP_DIR, keep=MAX_SNAPSHOTS):
+    """Take an online, compressed point-in-time snapshot of the fleet database.
+
+    When the database is unchanged since the newest snapshot no new file is written,
+    so identical copies never rotate out older, different states. Returns the path
+    of the snapshot holding the current state.
+    """
+    with _backup_lock:
+        os.makedirs(backup_dir, exist_ok=True)
+        stamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+        snapshot_path = os.path.join(backup_dir, f"{SNAPSHOT_PREFIX}{stamp}{SNAPSHOT_SUFFIX}")
+
+        fd, temp_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        try:
+            source = sqlite3.connect(db_file)
+            dest = sqlite3.connect(temp_path)
+            try:
+                _copy_database(source, dest)
+            finally:
+                dest.close()
+                source.close()
+
+            snapshots = list_snapshots(backup_dir)
+            if snapshots and _database_hash(temp_path) == _snapshot_hash(snapshots[-1]):
+                print(f"Database unchanged since {snapshots[-1]}, no new snapshot taken.")
+                return snapshots[-1]
+
+            with open(temp_path, "rb") as in_file, gzip.open(snapshot_path, "wb") as out_file:
+                shutil.copyfileobj(in_file, out_file)
+        finally:
+            os.remove(temp_path)
+
+        rotate_snapshots(backup_dir, keep)
+        print(f"Backup written to {snapshot_path}.")
+        return snapshot_path
+
+
+def restore_snapshot(snapshot_path, db_file=DB_FILE, backup_dir=BACKUP_DIR, keep=MAX_SNAPSHOTS):
+    """Restore the fleet database from a snapshot, writing into the live file page by page.
+
+    The current state is snapshotted first so a wrong restore can itself be undone.
+    Returns the path of that safety snapshot.
+    """
+    with _backup_lock:
+        # Decompress before the safety snapshot, whose rotation may remove the oldest file
+        temp_path = _decompress_to_temp(snapshot_path)
+        try:
+            safety_path = create_snapshot(db_file, backup_dir, keep)
+            source = sqlite3.connect(temp_path)
+            dest = sqlite3.connect(db_file)
+            try:
+                _copy_database(source, dest)
+            finally:
+                dest.close()
+                source.close()
+        finally:
+            os.remove(temp_path)
+    print(f"Database restored from {snapshot_path}, previous state saved to {safety_path}.")
+    return safety_path
+
+
+def _read_vehicles(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM fleet")
+        columns = [description[0] for description in cursor.description]
+        return {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        conn.close()
+
+
+def _load_vehicles(snapshot_path):
+    temp_path = _decompress_to_temp(snapshot_path)
+    try:
+        return _read_vehicles(temp_path)
+    finally:
+        os.remove(temp_path)
+
+
+def _diff_vehicles(older, newer):
+    added = {vid: newer[vid] for vid in newer.keys() - older.keys()}
+    removed = {vid: older[vid] for vid in older.keys() - newer.keys()}
+    changed = {}
+    for vid in older.keys() & newer.keys():
+        columns = {
+            col: (older[vid].get(col), newer[vid].get(col))
+            for col in older[vid].keys() | newer[vid].keys()
+            if older[vid].get(col) != newer[vid].get(col)
+        }
+        if columns:
+            changed[vid] = columns
+
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+
+def diff_snapshots(older_path, newer_path):
+    """Compare two snapshots by vehicle id.
+
+    Returns a dict with 'added' and 'removed' rows keyed by id, and 'changed'
+    mapping each id to {column: (old_value, new_value)}.
+    """
+    return _diff_vehicles(_load_vehicles(older_path), _load_vehicles(newer_path))
+
+
+def diff_with_current(snapshot_path, db_file=DB_FILE):
+    """Compare a snapshot (as older) with the live database (as newer), by vehicle id."""
+    return _diff_vehicles(_load_vehicles(snapshot_path), _read_vehicles(db_file))
+
+
+def _run_backup_in_background(db_file, backup_dir, keep):
+    def worker():
+        try:
+            create_snapshot(db_file, backup_dir, keep)
+        except Exception as e:
+            print(f"Error occurred while backing up database: {e}")
+
+    threading.Thread(target=worker, daemon=True).start()
+
+
+def schedule_backups(root, interval_ms=BACKUP_INTERVAL_MS, db_file=DB_FILE,
+                     backup_dir=BACKUP_DIR, keep=MAX_SNAPSHOTS):
+    """Take a snapshot now and every `interval_ms` on a worker thread, driven by the Tk event loop."""
+    def tick():
+        _run_backup_in_background(db_file, backup_dir, keep)
+        root.after(interval_ms, tick)
+
+    tick()
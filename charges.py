@@ -0,0 +1,131 @@
+import calendar
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from fleet_operations import DB_FILE, ChargeStatus, normalize_charge_flags
+from fleet_rollups import SITE_KEY
+from telematics import TELEMATICS_DIR, load_points, vehicle_keys_for_plates
+
+# Charges per use for a 2-axle van. `uses` is the projected uses per month for a
+# vehicle registered for the charge when no trip data is available for it.
+DEFAULT_TARIFFS = {
+    'ulez': {'auto_pay': 12.50, 'manual': 12.50, 'uses': 21},
+    'congestion': {'auto_pay': 15.00, 'manual': 17.50, 'uses': 21},
+    'dart': {'auto_pay': 2.63, 'manual': 3.00, 'uses': 8},
+}
+
+# Approximate zone bounding boxes (min_lat, max_lat, min_lon, max_lon) used to
+# count charged days from tracker points.
+CHARGE_ZONES = {
+    'ulez': (51.28, 51.70, -0.51, 0.34),
+    'congestion': (51.49, 51.53, -0.15, -0.07),
+    'dart': (51.455, 51.475, 0.24, 0.27),
+}
+DART_CROSSINGS_PER_DAY = 2
+
+charge_columns = {
+    'ulez': 'ulez_compliant',
+    'congestion': 'congestion_charge',
+    'dart': 'dart_charge',
+}
+
+
+def _month_bounds(month):
+    """Epoch-second range [start, end) of a 'YYYY-MM' month."""
+    year, mon = (int(part) for part in month.split('-'))
+    start = datetime(year, mon, 1, tzinfo=timezone.utc)
+    end = start + timedelta(days=calendar.monthrange(year, mon)[1])
+    return int(start.timestamp()), int(end.timestamp())
+
+
+def observed_zone_days(vehicle_keys, month, store_dir=TELEMATICS_DIR):
+    """Days each vehicle was seen inside each charge zone during the month.
+
+    `vehicle_keys` are telematics keys (see telematics.vehicle_keys_for_plates).
+    Returns a dict of zone -> array aligned with `vehicle_keys`, plus a boolean
+    array marking vehicles that have any tracker points in the month.
+    """
+    start, end = _month_bounds(month)
+    points = load_points(start=start, end=end, store_dir=store_dir)
+    vehicle_keys = np.asarray(vehicle_keys, dtype=np.int64)
+    tracked = np.isin(vehicle_keys, points['vehicle_key'])
+
+    days = {}
+    day_index = (points['ts'] - start) // 86400
+    for zone, (min_lat, max_lat, min_lon, max_lon) in CHARGE_ZONES.items():
+        inside = ((points['lat'] >= min_lat) & (points['lat'] <= max_lat) &
+                  (points['lon'] >= min_lon) & (points['lon'] <= max_lon))
+        visits = np.unique(np.stack([points['vehicle_key'][inside].astype(np.int64),
+                                     day_index[inside].astype(np.int64)]), axis=1)
+        counted_keys, counts = np.unique(visits[0], return_counts=True)
+        per_vehicle = np.zeros(len(vehicle_keys), dtype=np.int64)
+        pos = np.searchsorted(counted_keys, vehicle_keys)
+        found = pos < len(counted_keys)
+        found[found] = counted_keys[pos[found]] == vehicle_keys[found]
+        per_vehicle[found] = counts[pos[found]]
+        days[zone] = per_vehicle
+    return days, tracked
+
+
+def estimate_charges(month=None, tariffs=None, use_telematics=True, store_dir=TELEMATICS_DIR):
+    """Projected ULEZ, congestion and Dart charges for every vehicle in one vectorized pass.
+
+    Exempt vehicles cost nothing. Vehicles with tracker points in the month are
+    charged for the days observed in each zone; otherwise a vehicle flagged as
+    auto pay or manual is charged for the tariff's projected `uses`.
+    """
+    month = month or date.today().strftime('%Y-%m')
+    tariffs = {charge: {**tariff, **(tariffs or {}).get(charge, {})} for charge, tariff in DEFAULT_TARIFFS.items()}
+
+    with sqlite3.connect(DB_FILE) as conn:
+        # Same site key as the dashboard rollups, so tiles and reports group identically
+        fleet = pd.read_sql_query(f"""SELECT id, plate_nr, {SITE_KEY.format(row='fleet')} AS site,
+                ulez_compliant, congestion_charge, dart_charge
+            FROM fleet WHERE plate_nr != ''""", conn)
+
+    result = pd.DataFrame({'id': fleet['id'], 'plate_nr': fleet['plate_nr'], 'site': fleet['site']})
+    if fleet.empty:
+        for charge in charge_columns:
+            result[f'{charge}_cost'] = pd.Series(dtype=float)
+        result['total'] = pd.Series(dtype=float)
+        return result
+
+    if use_telematics:
+        vehicle_keys = vehicle_keys_for_plates(fleet['plate_nr'])
+        zone_days, tracked = observed_zone_days(vehicle_keys, month, store_dir)
+    else:
+        zone_days, tracked = {}, np.zeros(len(fleet), dtype=bool)
+
+    total = np.zeros(len(fleet))
+    for charge, column in charge_columns.items():
+        tariff = tariffs[charge]
+        status = normalize_charge_flags(fleet[column], column)
+        auto_pay = (status == ChargeStatus.AUTO_PAY).to_numpy()
+        manual = (status == ChargeStatus.MANUAL).to_numpy()
+        exempt = (status == ChargeStatus.EXEMPT).to_numpy()
+
+        rate = np.where(auto_pay, tariff['auto_pay'], tariff['manual'])
+        projected = np.where(auto_pay | manual, tariff['uses'], 0)
+        observed = zone_days.get(charge, np.zeros(len(fleet), dtype=np.int64))
+        if charge == 'dart':
+            observed = observed * DART_CROSSINGS_PER_DAY
+        uses = np.where(tracked, observed, projected)
+
+        cost = np.where(exempt, 0.0, uses * rate)
+        result[f'{charge}_cost'] = cost
+        total += cost
+
+    result['total'] = total
+    return result
+
+
+def charges_by_site(month=None, tariffs=None, use_telematics=True, store_dir=TELEMATICS_DIR):
+    """Projected charge totals per site for the month, highest first."""
+    per_vehicle = estimate_charges(month, tariffs, use_telematics, store_dir)
+    cost_columns = [f'{charge}_cost' for charge in charge_columns] + ['total']
+    totals = per_vehicle.groupby('site', sort=False)[cost_columns].sum()
+    totals['vehicles'] = per_vehicle.groupby('site', sort=False).size()
+    return totals.sort_values('total', ascending=False).reset_index()
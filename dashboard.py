@@ -1,9 +1,16 @@
 import tkinter as tk
+from tkinter import ttk
 from PIL import Image, ImageTk, ImageDraw
 import os
 import sys
+from datetime import date
 
 from fleet_dashboard import open_fleet_management
+from charges import charges_by_site
+from fuel_transactions import fuel_spend_by_site, detect_fuel_anomalies, anomaly_reasons
+from fleet_rollups import get_fleet_summary, get_site_counts, get_make_mileage
+
+TILE_REFRESH_MS = 5000
 
 
 # Resource path function to handle path differences in development and packaged apps
@@ -25,7 +32,7 @@ class MainDashboard:
     def __init__(self, parent):
         self.parent = parent
         self.parent.title("F & I Management Dashboard")
-        self.parent.geometry("900x650")
+        self.parent.geometry("900x750")
         self.parent.configure(bg="#2E2E2E")
 
         # Create the frame for the dashboard
@@ -70,6 +77,24 @@ class MainDashboard:
                                     font=("Segoe UI", 18, "bold"), bg="#2E2E2E", fg="#FFFFFF", anchor="center")
         self.title_label.pack(pady=10)
 
+        # Summary tiles, each backed by a single-row rollup lookup
+        self.tiles_frame = tk.Frame(self.frame, bg="#2E2E2E")
+        self.tiles_frame.pack(fill=tk.X, pady=10)
+
+        self.tiles = {}
+        tile_titles = ['Vehicles', 'Company / Private', 'ULEZ Non-Compliant', 'Avg Mileage', 'Top Site', 'Top Make']
+        for idx, title in enumerate(tile_titles):
+            tile = tk.Frame(self.tiles_frame, bg="#3A3A3A", padx=10, pady=8)
+            tile.grid(row=0, column=idx, padx=5, sticky="nsew")
+            self.tiles_frame.columnconfigure(idx, weight=1)
+
+            tk.Label(tile, text=title, font=("Segoe UI", 9), bg="#3A3A3A", fg="#AAAAAA").pack()
+            value_label = tk.Label(tile, text="-", font=("Segoe UI", 14, "bold"), bg="#3A3A3A", fg="#FFFFFF")
+            value_label.pack()
+            self.tiles[title] = value_label
+
+        self.refresh_tiles()
+
         # Main dashboard buttons
         self.main_button_frame = tk.Frame(self.frame, bg="#2E2E2E")
         self.main_button_frame.pack(pady=30, expand=True)
@@ -96,22 +121,110 @@ class MainDashboard:
                                      font=("Helvetica Neue", 10), bg="#2E2E2E", fg="#777777")
         self.footer_label.pack(side=tk.BOTTOM, pady=20)
 
+    def refresh_tiles(self):
+        try:
+            summary = get_fleet_summary()
+            top_site = get_site_counts(limit=1)
+            top_make = get_make_mileage(limit=1)
+
+            self.tiles['Vehicles'].config(text=str(summary['vehicles']))
+            self.tiles['Company / Private'].config(
+                text=f"{summary['company_vehicles']} / {summary['private_vehicles']}")
+            self.tiles['ULEZ Non-Compliant'].config(text=str(summary['ulez_non_compliant']))
+            self.tiles['Avg Mileage'].config(text=f"{summary['average_mileage']:,.0f}")
+            self.tiles['Top Site'].config(text=f"{top_site[0][0]} ({top_site[0][1]})" if top_site else "-")
+            self.tiles['Top Make'].config(
+                text=f"{top_make[0][0][:14]} ({top_make[0][2]:,.0f} mi)" if top_make else "-")
+        except Exception as e:
+            print(f"Error loading dashboard summary: {e}")
+
+        self.parent.after(TILE_REFRESH_MS, self.refresh_tiles)
+
     def open_fleet_management(self):
         open_fleet_management(self.parent)
 
     def open_reports_window(self):
-        # Placeholder for the vehicle reports window
+        # Vehicle reports window
         report_window = tk.Toplevel()
         report_window.title("Vehicle Reports")
-        report_window.geometry("600x400")
+        report_window.geometry("750x900")
         report_window.configure(bg="#2E2E2E")
 
         header = tk.Label(report_window, text="Vehicle Reports Dashboard", font=("Segoe UI", 16, "bold"),
                           bg="#4A90E2", fg="white", pady=15)
         header.pack(fill=tk.X)
 
-        # Sample content
-        report_label = tk.Label(report_window, text="Generate your vehicle reports here.",
-                                font=("Segoe UI", 14), bg="#2E2E2E", fg="#666")
-        report_label.pack(pady=20)
-# pyinstaller --onefile --windowed --add-data "logo1.png;." --add-data "fleet.db;." main.py
\ No newline at end of file
+        # Projected ULEZ / congestion / Dart charges per site
+        report_label = tk.Label(report_window, text="Projected charges per site this month",
+                                font=("Segoe UI", 14), bg="#2E2E2E", fg="#FFFFFF")
+        report_label.pack(pady=(20, 10))
+
+        columns = ['SITE', 'VEHICLES', 'ULEZ', 'CONGEST', 'DART', 'TOTAL']
+        charges_tree = ttk.Treeview(report_window, columns=columns, show="headings", height=7)
+        for col in columns:
+            charges_tree.heading(col, text=col)
+            charges_tree.column(col, anchor="center", width=90)
+        charges_tree.pack(fill=tk.BOTH, expand=True, padx=20)
+
+        # Fuel card spend per site this month
+        tk.Label(report_window, text="Fuel spend per site this month",
+                 font=("Segoe UI", 14), bg="#2E2E2E", fg="#FFFFFF").pack(pady=(20, 10))
+
+        fuel_columns = ['SITE', 'SPEND', 'LITRES', 'FILLS']
+        fuel_tree = ttk.Treeview(report_window, columns=fuel_columns, show="headings", height=6)
+        for col in fuel_columns:
+            fuel_tree.heading(col, text=col)
+            fuel_tree.column(col, anchor="center", width=90)
+        fuel_tree.pack(fill=tk.BOTH, expand=True, padx=20)
+
+        # Fuel spend flagged for review
+        tk.Label(report_window, text="Fuel anomalies",
+                 font=("Segoe UI", 14), bg="#2E2E2E", fg="#FFFFFF").pack(pady=(20, 10))
+
+        anomaly_columns = ['PLATE NR', 'MONTH', 'SPEND', 'REASON']
+        anomaly_tree = ttk.Treeview(report_window, columns=anomaly_columns, show="headings", height=6)
+        for col in anomaly_columns:
+            anomaly_tree.heading(col, text=col)
+            anomaly_tree.column(col, anchor="center", width=90)
+        anomaly_tree.pack(fill=tk.BOTH, expand=True, padx=20)
+
+        def refresh_charges():
+            for item in charges_tree.get_children():
+                charges_tree.delete(item)
+            try:
+                totals = charges_by_site()
+            except Exception as e:
+                print(f"Error occurred while estimating charges: {e}")
+                return
+            for row in totals.itertuples(index=False):
+                charges_tree.insert("", "end", values=(
+                    row.site, row.vehicles, f"£{row.ulez_cost:,.2f}", f"£{row.congestion_cost:,.2f}",
+                    f"£{row.dart_cost:,.2f}", f"£{row.total:,.2f}"))
+
+        def refresh_fuel():
+            for tree in (fuel_tree, anomaly_tree):
+                for item in tree.get_children():
+                    tree.delete(item)
+            try:
+                spend = fuel_spend_by_site(date.today().strftime('%Y-%m'))
+                anomalies = detect_fuel_anomalies()
+            except Exception as e:
+                print(f"Error occurred while loading fuel reports: {e}")
+                return
+            for row in spend.sort_values('spend', ascending=False).itertuples(index=False):
+                fuel_tree.insert("", "end", values=(row.site, f"£{row.spend:,.2f}", f"{row.litres:,.1f}", row.fills))
+            for row in anomalies.itertuples(index=False):
+                anomaly_tree.insert("", "end", values=(
+                    row.plate_nr, row.month, f"£{row.spend:,.2f}", anomaly_reasons.get(row.reason, row.reason)))
+
+        def refresh_reports():
+            refresh_charges()
+            refresh_fuel()
+
+        tk.Button(report_window, text="Recalculate", font=("Segoe UI", 11, "bold"),
+                  bg="#4A90E2", fg="white", relief="flat", width=15,
+                  command=refresh_reports).pack(pady=15)
+
+        refresh_reports()
+
+# pyinstaller --onefile --windowed --add-data "logo1.png;." --add-data "fleet.db;." main.py
@@ -1,8 +1,12 @@
-import sqlite3
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, messagebox, simpledialog, filedialog
 from fleet_operations import  add_vehicle, update_vehicle, fetch_all_vehicles, \
-    refresh_treeview, get_vehicle_by_id, save_vehicle_to_db
+    refresh_treeview, get_vehicle_by_id, save_vehicle_to_db, empty_vehicle, COLUMNS
+from backup import list_snapshots, snapshot_time, create_snapshot, restore_snapshot, \
+    diff_snapshots, diff_with_current
+from fuel_transactions import import_fuel_statement, FUEL_PROVIDERS
+from telematics import import_telematics_export, update_fleet_mileage
 
 
 def show_dashboard(parent):
@@ -21,12 +25,7 @@ def show_dashboard(parent):
     tree_scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
 
     # ---------- Define Columns ----------
-    columns = [
-        'ID', 'PLATE NR', 'DRIVER', 'SITE', 'MAKE', 'MOT DUE',
-        'TAX DUE', 'SHELL', 'ESSO', 'ULEZ', 'CONGEST', 'DART',
-        'MILEAGE', 'NO TRACK', 'DUE FOR CAMBELT', 'QUARTIX',
-        'DIVIDE BY SITES', 'PRIVATE', 'SIDE NOTES'
-    ]
+    columns = COLUMNS
 
     treeview = ttk.Treeview(container, columns=columns, show="headings",
                             yscrollcommand=tree_scroll_y.set,
@@ -59,8 +58,8 @@ def show_dashboard(parent):
 
     # ---------- Populate with Database Data ----------
     fleet_data = fetch_all_vehicles()
-    for vehicle in fleet_data:
-        treeview.insert("", "end", values=vehicle)
+    for values in fleet_data.rows():
+        treeview.insert("", "end", values=values)
 
     return treeview
 
@@ -107,30 +106,17 @@ def empty_vehicle_by_id(treeview):
             messagebox.showwarning("Invalid ID", "Vehicle ID must be a number.")
             return
 
-        with sqlite3.connect('fleet.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM fleet WHERE id=?", (vehicle_id,))
-            vehicle = cursor.fetchone()
-
-            if not vehicle:
-                messagebox.showwarning("Not Found", f"No vehicle found with ID {vehicle_id}.")
-                return
-
-            confirm = messagebox.askyesno("Confirm Emptying", f"Are you sure you want to clear vehicle ID {vehicle_id}?")
-            if confirm:
-                cursor.execute('''
-                    UPDATE fleet
-                    SET plate_nr="", driver=NULL, site=NULL, make="", mot_due=NULL, tax_due=NULL,
-                        shell_account=NULL, esso_account=NULL, ulez_compliant=NULL,
-                        congestion_charge=NULL, dart_charge=NULL, mileage=NULL,
-                        no_track=NULL, due_for_cambelt=NULL, quartix=NULL, divide_by_sites=NULL,
-                        private=NULL, side_notes=NULL
-                    WHERE id=?
-                ''', (vehicle_id,))
-                conn.commit()
-                messagebox.showinfo("Success", f"Vehicle ID {vehicle_id} has been cleared.")
-                refresh_treeview(treeview)
-                dialog.destroy()
+        vehicle = get_vehicle_by_id(vehicle_id)
+        if not vehicle:
+            messagebox.showwarning("Not Found", f"No vehicle found with ID {vehicle_id}.")
+            return
+
+        confirm = messagebox.askyesno("Confirm Emptying", f"Are you sure you want to clear vehicle ID {vehicle_id}?")
+        if confirm:
+            empty_vehicle(vehicle_id)
+            messagebox.showinfo("Success", f"Vehicle ID {vehicle_id} has been cleared.")
+            refresh_treeview(treeview)
+            dialog.destroy()
 
     # Buttons
     tk.Button(button_frame, text="Empty Vehicle", font=("Segoe UI", 11, "bold"),
@@ -172,15 +158,13 @@ def edit_vehicle_by_id(treeview):
     canvas.create_window((0, 0), window=fields_frame, anchor="nw")
 
     entry_widgets = {}
-    fields = [
-        'ID', 'PLATE NR', 'DRIVER', 'SITE', 'MAKE', 'MOT DUE', 'TAX DUE', 'SHELL', 'ESSO', 'ULEZ', 'CONGEST',
-        'DART', 'MILEAGE', 'NO TRACK', 'DUE FOR CAMBELT', 'QUARTIX', 'DIVIDE BY SITES', 'PRIVATE', 'SIDE NOTES'
-    ]
+    fields = COLUMNS
 
     def build_fields(vehicle):
         for widget in fields_frame.winfo_children():
             widget.destroy()
         entry_widgets.clear()
+        vehicle_data = vehicle.as_dict()
 
         for idx, field in enumerate(fields):
             row = idx // 2
@@ -192,7 +176,7 @@ def edit_vehicle_by_id(treeview):
             entry = tk.Entry(fields_frame, font=("Segoe UI", 10), width=30)
             entry.grid(row=row, column=col + 1, padx=5, pady=5)
 
-            value = str(vehicle[idx]) if idx < len(vehicle) and vehicle[idx] is not None else ""
+            value = str(vehicle_data[field]) if vehicle_data.get(field) is not None else ""
             entry.insert(0, value)
             entry_widgets[field] = entry
 
@@ -234,6 +218,188 @@ def edit_vehicle_by_id(treeview):
     tk.Button(button_frame, text="Cancel", font=("Segoe UI", 11), bg="#DC3545", fg="white", width=12,
               command=edit_window.destroy).pack(side=tk.LEFT, padx=10)
 
+def import_fuel_statement_dialog(parent):
+    """Pick a SHELL/ESSO statement CSV and import it on a worker thread."""
+    csv_file = filedialog.askopenfilename(parent=parent, title="Select Fuel Statement",
+                                          filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+    if not csv_file:
+        return
+
+    provider = simpledialog.askstring("Fuel Provider", f"Statement provider ({' / '.join(FUEL_PROVIDERS)}):",
+                                      parent=parent)
+    if not provider:
+        return
+    if provider.strip().upper() not in FUEL_PROVIDERS:
+        messagebox.showwarning("Invalid Provider", f"Provider must be one of: {', '.join(FUEL_PROVIDERS)}.",
+                               parent=parent)
+        return
+
+    def on_success(rows):
+        if rows:
+            messagebox.showinfo("Success", f"{rows} fuel transactions imported.", parent=parent)
+        else:
+            messagebox.showinfo("Nothing Imported",
+                                "No transactions imported. The statement may already be loaded or have no readable rows.",
+                                parent=parent)
+
+    run_in_background(parent, lambda: import_fuel_statement(csv_file, provider), on_success,
+                      "Import Failed", "Error importing statement")
+
+def run_in_background(parent, work, on_success, error_title, error_message):
+    """Run `work` on a worker thread, then call `on_success` with its result on the Tk thread."""
+    result = {}
+
+    def worker():
+        try:
+            result['value'] = work()
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+
+    # Poll from the Tk event loop so the window stays responsive during long jobs
+    def check_finished():
+        if thread.is_alive():
+            parent.after(200, check_finished)
+        elif 'error' in result:
+            messagebox.showerror(error_title, f"{error_message}: {result['error']}", parent=parent)
+        else:
+            on_success(result['value'])
+
+    check_finished()
+
+def import_telematics_dialog(parent):
+    """Pick a Quartix position or trip export and import it on a worker thread."""
+    export_file = filedialog.askopenfilename(parent=parent, title="Select Telematics Export",
+                                             filetypes=[("Telematics exports", "*.csv *.json *.jsonl"),
+                                                        ("All files", "*.*")])
+    if not export_file:
+        return
+
+    def on_success(rows):
+        if rows:
+            messagebox.showinfo("Success", f"{rows} telematics rows imported.", parent=parent)
+        else:
+            messagebox.showinfo("Nothing Imported",
+                                "No rows imported. The export may already be loaded or match no fleet vehicles.",
+                                parent=parent)
+
+    run_in_background(parent, lambda: import_telematics_export(export_file), on_success,
+                      "Import Failed", "Error importing telematics export")
+
+def update_mileage_dialog(treeview):
+    """Add tracked distance to each vehicle's mileage on a worker thread, then refresh the list."""
+    parent = treeview.winfo_toplevel()
+    if not messagebox.askyesno("Update Mileage",
+                               "Add the distance recorded by the trackers since the last update "
+                               "to each vehicle's mileage?", parent=parent):
+        return
+
+    def on_success(vehicles):
+        messagebox.showinfo("Success", f"Mileage updated for {vehicles} vehicles.", parent=parent)
+        refresh_treeview(treeview)
+
+    run_in_background(parent, update_fleet_mileage, on_success, "Update Failed", "Error updating mileage")
+
+def format_diff(diff):
+    """Readable summary of a backup diff, one vehicle per block."""
+    lines = []
+    for vid, row in sorted(diff['removed'].items()):
+        lines.append(f"ID {vid}: removed ({row.get('plate_nr')})")
+    for vid, row in sorted(diff['added'].items()):
+        lines.append(f"ID {vid}: added ({row.get('plate_nr')})")
+    for vid, columns in sorted(diff['changed'].items()):
+        lines.append(f"ID {vid}: changed")
+        for col, (old, new) in sorted(columns.items()):
+            lines.append(f"    {col}: {old!r} -> {new!r}")
+    return "\n".join(lines) or "No differences."
+
+def open_backup_dialog(treeview):
+    """List backup snapshots and restore one or compare them by vehicle ID."""
+    dialog = tk.Toplevel()
+    dialog.title("Backups")
+    dialog.geometry("700x550")
+    dialog.configure(bg="#F9F9F9")
+
+    tk.Label(dialog, text="Backup Snapshots", font=("Segoe UI", 14, "bold"), bg="#F9F9F9", fg="#333")\
+        .pack(pady=(20, 10))
+
+    snapshot_list = tk.Listbox(dialog, selectmode=tk.EXTENDED, font=("Segoe UI", 10), height=8)
+    snapshot_list.pack(fill=tk.X, padx=20)
+
+    result_text = tk.Text(dialog, font=("Consolas", 10), height=14, wrap="none")
+    result_text.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+
+    snapshots = []
+
+    def load_snapshots():
+        snapshots[:] = list_snapshots()[::-1]  # Newest first
+        snapshot_list.delete(0, tk.END)
+        for path in snapshots:
+            snapshot_list.insert(tk.END, snapshot_time(path).strftime("%d/%m/%Y %H:%M:%S"))
+
+    def show_result(text):
+        result_text.delete("1.0", tk.END)
+        result_text.insert(tk.END, text)
+
+    def selected():
+        return [snapshots[i] for i in snapshot_list.curselection()]
+
+    def backup_now():
+        def on_success(path):
+            load_snapshots()
+            show_result(f"Current state saved in snapshot taken {snapshot_time(path).strftime('%d/%m/%Y %H:%M:%S')}.")
+
+        run_in_background(dialog, create_snapshot, on_success, "Backup Failed", "Error backing up database")
+
+    def compare():
+        paths = selected()
+        if len(paths) == 1:
+            run_in_background(dialog, lambda: diff_with_current(paths[0]), lambda diff: show_result(format_diff(diff)),
+                              "Compare Failed", "Error comparing snapshot")
+        elif len(paths) == 2:
+            older, newer = sorted(paths)
+            run_in_background(dialog, lambda: diff_snapshots(older, newer), lambda diff: show_result(format_diff(diff)),
+                              "Compare Failed", "Error comparing snapshots")
+        else:
+            messagebox.showwarning("Select Snapshots",
+                                   "Select one snapshot to compare with now, or two to compare with each other.",
+                                   parent=dialog)
+
+    def restore():
+        paths = selected()
+        if len(paths) != 1:
+            messagebox.showwarning("Select Snapshot", "Select exactly one snapshot to restore.", parent=dialog)
+            return
+        taken = snapshot_time(paths[0]).strftime("%d/%m/%Y %H:%M:%S")
+        if not messagebox.askyesno("Confirm Restore",
+                                   f"Restore the fleet as it was at {taken}? "
+                                   "The current data is backed up first.", parent=dialog):
+            return
+
+        def on_success(safety_path):
+            messagebox.showinfo("Success", f"Fleet restored to {taken}.", parent=dialog)
+            refresh_treeview(treeview)
+            load_snapshots()
+
+        run_in_background(dialog, lambda: restore_snapshot(paths[0]), on_success,
+                          "Restore Failed", "Error restoring snapshot")
+
+    button_frame = tk.Frame(dialog, bg="#F9F9F9")
+    button_frame.pack(pady=(0, 15))
+
+    tk.Button(button_frame, text="Backup Now", font=("Segoe UI", 11), bg="#4A90E2", fg="white",
+              relief="flat", width=12, command=backup_now).pack(side=tk.LEFT, padx=10)
+    tk.Button(button_frame, text="Compare", font=("Segoe UI", 11), bg="#607D8B", fg="white",
+              relief="flat", width=12, command=compare).pack(side=tk.LEFT, padx=10)
+    tk.Button(button_frame, text="Restore", font=("Segoe UI", 11, "bold"), bg="#D9534F", fg="white",
+              relief="flat", width=12, command=restore).pack(side=tk.LEFT, padx=10)
+    tk.Button(button_frame, text="Close", font=("Segoe UI", 10), bg="#E0E0E0", fg="#333",
+              relief="flat", width=10, command=dialog.destroy).pack(side=tk.LEFT, padx=10)
+
+    load_snapshots()
+
 def open_fleet_management(parent):
     """Open the fleet management window to manage the fleet."""
     management_window = tk.Toplevel(parent)
@@ -266,6 +432,38 @@ def open_fleet_management(parent):
         padx=15, pady=8
     ).pack(side=tk.LEFT, padx=10)
 
+    # Data tools (imports, tracker mileage, backups) on a second row
+    tools_frame = tk.Frame(management_window, bg="#f0f0f0")
+    tools_frame.pack(side=tk.TOP, fill=tk.X, padx=20, pady=(0, 10))
+
+    tk.Button(
+        tools_frame, text="Import Fuel",
+        command=lambda: import_fuel_statement_dialog(management_window),
+        relief="flat", bg="#FF9800", fg="white", font=("Segoe UI", 11, "bold"),
+        padx=15, pady=8
+    ).pack(side=tk.LEFT, padx=10)
+
+    tk.Button(
+        tools_frame, text="Import Telematics",
+        command=lambda: import_telematics_dialog(management_window),
+        relief="flat", bg="#009688", fg="white", font=("Segoe UI", 11, "bold"),
+        padx=15, pady=8
+    ).pack(side=tk.LEFT, padx=10)
+
+    tk.Button(
+        tools_frame, text="Update Mileage from Tracker",
+        command=lambda: update_mileage_dialog(management_window.treeview_management),
+        relief="flat", bg="#3F51B5", fg="white", font=("Segoe UI", 11, "bold"),
+        padx=15, pady=8
+    ).pack(side=tk.LEFT, padx=10)
+
+    tk.Button(
+        tools_frame, text="Backups",
+        command=lambda: open_backup_dialog(management_window.treeview_management),
+        relief="flat", bg="#607D8B", fg="white", font=("Segoe UI", 11, "bold"),
+        padx=15, pady=8
+    ).pack(side=tk.LEFT, padx=10)
+
     # ---------- Treeview Area ----------
     treeview_frame = tk.Frame(management_window, bg="#f0f0f0")
     treeview_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
@@ -276,11 +474,7 @@ def open_fleet_management(parent):
     horizontal_scrollbar = ttk.Scrollbar(treeview_frame, orient="horizontal")
     horizontal_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
 
-    columns = [
-        'ID', 'PLATE NR', 'DRIVER', 'SITE', 'MAKE', 'MOT DUE', 'TAX DUE', 'SHELL', 'ESSO',
-        'ULEZ', 'CONGEST', 'DART', 'MILEAGE', 'NO TRACK', 'DUE FOR CAMBELT',
-        'QUARTIX', 'DIVIDE BY SITES', 'PRIVATE', 'SIDE NOTES'
-    ]
+    columns = COLUMNS
 
     treeview_management = ttk.Treeview(
         treeview_frame, columns=columns, show="headings",
@@ -305,19 +499,16 @@ def open_fleet_management(parent):
 
     # ---------- Load Data ----------
     fleet_data = fetch_all_vehicles()
-    for vehicle in fleet_data:
-        treeview_management.insert("", "end", values=vehicle)
+    for values in fleet_data.rows():
+        treeview_management.insert("", "end", values=values)
 
     # Attach Treeview for other callbacks
     management_window.treeview_management = treeview_management
 
 def open_add_edit_vehicle_dialog(management_window, editing=False, vehicle=None):
 
-    fields = [
-        'PLATE NR', 'DRIVER', 'SITE', 'MAKE', 'MOT DUE', 'TAX DUE', 'SHELL', 'ESSO', 'ULEZ', 'CONGEST', 'DART',
-        'MILEAGE', 'NO TRACK', 'DUE FOR CAMBELT', 'QUARTIX', 'DIVIDE BY SITES', 'PRIVATE', 'SIDE NOTES'
-    ]
-    vehicle_data = dict(zip(fields, vehicle[1:])) if editing and vehicle else {field: "" for field in fields}
+    fields = COLUMNS[1:]
+    vehicle_data = vehicle.as_dict() if editing and vehicle else {field: "" for field in fields}
 
     dialog = tk.Toplevel(management_window)
     dialog.title("Edit Vehicle" if editing else "Add Vehicle")
@@ -362,7 +553,7 @@ def open_add_edit_vehicle_dialog(management_window, editing=False, vehicle=None)
 
     save_button = tk.Button(
         button_frame, text="Save",
-        command=lambda: save_vehicle_to_db(dialog, input_fields, vehicle[0] if editing else None, management_window),
+        command=lambda: save_vehicle_to_db(dialog, input_fields, vehicle.id if editing else None, management_window),
         relief="flat", bg="#4CAF50", fg="white", font=("Segoe UI", 11, "bold"), padx=20, pady=8
     )
     save_button.pack(side=tk.LEFT, padx=10)
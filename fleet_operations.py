@@ -1,4 +1,7 @@
 import sqlite3
+import sys
+from array import array
+from enum import Enum
 from tkinter import messagebox
 import pandas as pd
 
@@ -25,6 +28,234 @@ field_mapping = {
     'SIDE NOTES': 'side_notes'
 }
 
+# Treeview headings and matching fleet table fields, in display order
+COLUMNS = ['ID'] + list(field_mapping)
+FIELDS = ['id'] + list(field_mapping.values())
+
+
+class ChargeStatus(Enum):
+    """Normalized ULEZ / congestion / Dart charge flag, stored as its value."""
+    EXEMPT = 'EXEMPT'
+    AUTO_PAY = 'AUTO PAY'
+    MANUAL = 'MANUAL'
+    UNKNOWN = None
+
+
+CHARGE_FIELDS = ['ULEZ', 'CONGEST', 'DART']
+
+_shared_charge_aliases = {
+    'EXEMPT': ChargeStatus.EXEMPT,
+    'EXCEMPT': ChargeStatus.EXEMPT,
+    'AUTO PAY': ChargeStatus.AUTO_PAY,
+    'AUTOPAY': ChargeStatus.AUTO_PAY,
+    'ACCOUNT': ChargeStatus.AUTO_PAY,
+    'MANUAL': ChargeStatus.MANUAL
+}
+
+# Aliases per fleet column: in ULEZ "Yes" means the vehicle is compliant, while
+# for congestion and Dart it means the vehicle is registered to pay
+charge_flag_aliases = {
+    'ulez_compliant': {
+        **_shared_charge_aliases,
+        'COMPLIANT': ChargeStatus.EXEMPT,
+        'YES': ChargeStatus.EXEMPT,
+        'Y': ChargeStatus.EXEMPT,
+        'NON COMPLIANT': ChargeStatus.MANUAL,
+        'NO': ChargeStatus.MANUAL,
+        'N': ChargeStatus.MANUAL
+    },
+    'congestion_charge': {
+        **_shared_charge_aliases,
+        'YES': ChargeStatus.AUTO_PAY,
+        'Y': ChargeStatus.AUTO_PAY,
+        'NO': ChargeStatus.MANUAL,
+        'N': ChargeStatus.MANUAL
+    },
+    'dart_charge': {
+        **_shared_charge_aliases,
+        'YES': ChargeStatus.AUTO_PAY,
+        'Y': ChargeStatus.AUTO_PAY,
+        'NO': ChargeStatus.MANUAL,
+        'N': ChargeStatus.MANUAL
+    }
+}
+
+
+def normalize_charge_flag(value, field):
+    """ChargeStatus of one flag in the given fleet column, e.g. 'ulez_compliant'."""
+    if value is None:
+        return ChargeStatus.UNKNOWN
+    key = ' '.join(str(value).upper().split())
+    return charge_flag_aliases[field].get(key, ChargeStatus.UNKNOWN)
+
+
+def normalize_charge_flags(series, field):
+    """Vectorized normalize_charge_flag over a pandas Series of free-text flags."""
+    keys = series.astype('string').str.upper().str.split().str.join(' ')
+    return keys.map(charge_flag_aliases[field]).fillna(ChargeStatus.UNKNOWN)
+
+
+def clean_charge_flag(value, field):
+    """Value to store for a charge flag in the given fleet column.
+
+    Recognized flags become their canonical text, blanks become None, and anything
+    else (e.g. 'Exempt until 2026') is kept as entered.
+    """
+    if value is None or not str(value).strip():
+        return None
+    status = normalize_charge_flag(value, field)
+    return value if status is ChargeStatus.UNKNOWN else status.value
+
+
+def clean_charge_flags(series, field):
+    """Vectorized clean_charge_flag over a pandas Series."""
+    keys = series.astype('string').str.upper().str.split().str.join(' ')
+    canonical = keys.map({alias: status.value for alias, status in charge_flag_aliases[field].items()})
+    blank = keys.isna() | (keys == '')
+    return canonical.astype(object).where(canonical.notna(), series).where(~blank, None)
+
+
+# Low-cardinality columns stored as integer codes into a per-Fleet string pool
+ENCODED_FIELDS = (
+    'site', 'shell_account', 'esso_account', 'ulez_compliant', 'congestion_charge',
+    'dart_charge', 'no_track', 'quartix', 'divide_by_sites', 'private'
+)
+MISSING_MILEAGE = -1
+
+
+class StringPool:
+    """Dictionary encoding for one column: each distinct string is stored once."""
+    __slots__ = ('values', 'codes')
+
+    def __init__(self):
+        self.values = [None]
+        self.codes = {None: 0}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            value = sys.intern(value) if isinstance(value, str) else value
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def decode(self, code):
+        return self.values[code]
+
+
+def _new_column(field):
+    if field == 'id':
+        return array('q')
+    if field == 'mileage':
+        return array('q')
+    if field in ENCODED_FIELDS:
+        return array('I')
+    return []
+
+
+class Fleet:
+    """Column-oriented collection of fleet rows.
+
+    Ids and mileage are packed into integer arrays, the ENCODED_FIELDS into
+    codes against string pools owned by this Fleet, and the remaining text
+    columns into plain lists. Mileage that is not a whole number (e.g. '161,596') is kept
+    as entered in a side table. Iterating yields Vehicle views over the
+    columns rather than copies of each row.
+    """
+    __slots__ = ('_columns', '_pools', '_raw_mileage')
+
+    def __init__(self, rows=()):
+        self._columns = {field: _new_column(field) for field in FIELDS}
+        self._pools = {field: StringPool() for field in ENCODED_FIELDS}
+        self._raw_mileage = {}
+        for row in rows:
+            self.append(row)
+
+    def append(self, row):
+        """Add one row given in FIELDS order, e.g. straight from a fleet query."""
+        for field, value in zip(FIELDS, row):
+            column = self._columns[field]
+            if field in ENCODED_FIELDS:
+                column.append(self._pools[field].encode(value))
+            elif field == 'mileage':
+                column.append(self._pack_mileage(value, len(column)))
+            else:
+                column.append(value)
+
+    def _pack_mileage(self, value, index):
+        if value is None:
+            return MISSING_MILEAGE
+        if isinstance(value, int) and value >= 0:
+            return value
+        if isinstance(value, str) and value.strip().isdecimal():
+            return int(value)
+        self._raw_mileage[index] = value
+        return MISSING_MILEAGE
+
+    def value(self, field, index):
+        raw = self._columns[field][index]
+        if field in ENCODED_FIELDS:
+            return self._pools[field].decode(raw)
+        if field == 'mileage' and raw == MISSING_MILEAGE:
+            return self._raw_mileage.get(index)
+        return raw
+
+    def column(self, field):
+        """Iterate the decoded values of one column."""
+        if field in ENCODED_FIELDS:
+            pool = self._pools[field].values
+            return (pool[code] for code in self._columns[field])
+        return (self.value(field, index) for index in range(len(self)))
+
+    def rows(self):
+        """Yield each vehicle as a tuple in COLUMNS order, e.g. for Treeview values."""
+        for index in range(len(self)):
+            yield tuple(self.value(field, index) for field in FIELDS)
+
+    def __len__(self):
+        return len(self._columns['id'])
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("fleet index out of range")
+        return Vehicle(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield Vehicle(self, index)
+
+
+class Vehicle:
+    """A single fleet row, read through from its Fleet's columns."""
+    __slots__ = ('_fleet', '_index')
+
+    def __init__(self, fleet, index):
+        self._fleet = fleet
+        self._index = index
+
+    def as_tuple(self):
+        return tuple(self._fleet.value(field, self._index) for field in FIELDS)
+
+    def as_dict(self):
+        """Values keyed by Treeview heading, e.g. {'PLATE NR': ..., 'MILEAGE': ...}."""
+        return {heading: self._fleet.value(field, self._index) for heading, field in zip(COLUMNS, FIELDS)}
+
+    def __repr__(self):
+        return f"Vehicle(id={self.id!r}, plate_nr={self.plate_nr!r})"
+
+
+def _field_property(field):
+    return property(lambda vehicle: vehicle._fleet.value(field, vehicle._index))
+
+
+for _field in FIELDS:
+    setattr(Vehicle, _field, _field_property(_field))
+del _field
+
+
 def initialize_database():
     with sqlite3.connect(DB_FILE) as conn:
         cursor = conn.cursor()
@@ -66,6 +297,10 @@ def import_dataset_to_db(csv_file):
         if 'MILEAGE' in df.columns:
             df['MILEAGE'] = pd.to_numeric(df['MILEAGE'], errors='coerce').fillna(0).astype(int)
 
+        for field in CHARGE_FIELDS:
+            if field in df.columns:
+                df[field] = clean_charge_flags(df[field], field_mapping[field])
+
         if 'Side Notes' in df.columns:
             df['Side Notes'] = df['Side Notes'].apply(lambda x: str(x).strip() if isinstance(x, str) else x)
 
@@ -108,10 +343,12 @@ def import_dataset_to_db(csv_file):
 def read_fleet_data():
     with sqlite3.connect(DB_FILE) as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM fleet")
-        return cursor.fetchall()
+        cursor.execute(f"SELECT {', '.join(FIELDS)} FROM fleet")
+        return Fleet(cursor)
 
 def add_vehicle(vehicle_data):
+    vehicle_data = [clean_charge_flag(value, field_mapping[heading]) if heading in CHARGE_FIELDS else value
+                    for heading, value in zip(field_mapping, vehicle_data)]
     with sqlite3.connect(DB_FILE) as conn:
         cursor = conn.cursor()
         cursor.execute('''INSERT INTO fleet (
@@ -145,6 +382,8 @@ def update_vehicle(vehicle_id, new_data):
         for key, value in new_data.items():
             if key == 'ID':
                 continue  # Do not update the ID
+            if key in CHARGE_FIELDS:
+                value = clean_charge_flag(value, field_mapping[key])
             db_field = field_mapping.get(key)
             print("db_field: ",db_field)
             if db_field:
@@ -169,10 +408,10 @@ def update_vehicle(vehicle_id, new_data):
 def get_vehicle_by_id(vehicle_id):
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM fleet WHERE id = ?", (vehicle_id,))
-    vehicle = cursor.fetchone()
+    cursor.execute(f"SELECT {', '.join(FIELDS)} FROM fleet WHERE id = ?", (vehicle_id,))
+    row = cursor.fetchone()
     conn.close()
-    return vehicle
+    return Fleet([row])[0] if row else None
 
 def empty_vehicle(vehicle_id):
     with sqlite3.connect(DB_FILE) as conn:
@@ -261,10 +500,10 @@ def save_vehicle_to_db(dialog, input_fields, vehicle_id, management_window):
 def fetch_all_vehicles():
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM fleet")
-    rows = cursor.fetchall()
+    cursor.execute(f"SELECT {', '.join(FIELDS)} FROM fleet")
+    fleet = Fleet(cursor)
     conn.close()
-    return rows
+    return fleet
 
 def refresh_treeview(treeview):
     for item in treeview.get_children():
@@ -272,5 +511,5 @@ def refresh_treeview(treeview):
 
     fleet_data = fetch_all_vehicles()
 
-    for vehicle in fleet_data:
-        treeview.insert("", "end", values=vehicle)
+    for values in fleet_data.rows():
+        treeview.insert("", "end", values=values)
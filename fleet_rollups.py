@@ -0,0 +1,164 @@
+import sqlite3
+
+from fleet_operations import DB_FILE, ChargeStatus, charge_flag_aliases
+
+
+def _collapse_spaces_sql(expr, passes=5):
+    """Collapse runs of whitespace (up to 2 ** passes long) in a SQL text expression to one space."""
+    expr = f"REPLACE(REPLACE(REPLACE({expr}, CHAR(9), ' '), CHAR(10), ' '), CHAR(13), ' ')"
+    for _ in range(passes):
+        expr = f"REPLACE({expr}, '  ', ' ')"
+    return expr
+
+
+_charged_flags = ", ".join(
+    f"'{alias}'" for alias, status in charge_flag_aliases['ulez_compliant'].items()
+    if status in (ChargeStatus.AUTO_PAY, ChargeStatus.MANUAL)
+)
+
+# SQL expressions over a fleet row, written against a `{row}` alias (NEW, OLD or fleet)
+ACTIVE = "(COALESCE({row}.plate_nr, '') != '')"
+PRIVATE = "(UPPER(TRIM(COALESCE({row}.private, ''))) IN ('YES', 'Y'))"
+ULEZ_CHARGED = f"(UPPER(TRIM(COALESCE({{row}}.ulez_compliant, ''))) IN ({_charged_flags}))"
+SITE_KEY = f"COALESCE(NULLIF(TRIM({_collapse_spaces_sql('UPPER({row}.site)')}), ''), 'UNKNOWN')"
+MAKE_KEY = "COALESCE(NULLIF(TRIM({row}.make), ''), 'UNKNOWN')"
+
+
+def _apply_row_sql(row, sign):
+    """Statements adding (sign '+') or removing (sign '-') one fleet row's contribution to the rollups."""
+    active = ACTIVE.format(row=row)
+    private = PRIVATE.format(row=row)
+    charged = ULEZ_CHARGED.format(row=row)
+    site = SITE_KEY.format(row=row)
+    make = MAKE_KEY.format(row=row)
+    mileage = f"COALESCE({row}.mileage, 0)"
+    return f'''
+        UPDATE fleet_summary SET
+            vehicles = vehicles {sign} {active},
+            private_vehicles = private_vehicles {sign} ({active} AND {private}),
+            company_vehicles = company_vehicles {sign} ({active} AND NOT {private}),
+            ulez_non_compliant = ulez_non_compliant {sign} ({active} AND {charged}),
+            mileage_total = mileage_total {sign} (CASE WHEN {active} THEN {mileage} ELSE 0 END)
+        WHERE id = 1;
+        INSERT OR IGNORE INTO site_rollup (site) SELECT {site} WHERE {active};
+        UPDATE site_rollup SET
+            vehicles = vehicles {sign} 1,
+            ulez_non_compliant = ulez_non_compliant {sign} {charged}
+        WHERE {active} AND site = {site};
+        INSERT OR IGNORE INTO make_rollup (make) SELECT {make} WHERE {active};
+        UPDATE make_rollup SET
+            vehicles = vehicles {sign} 1,
+            mileage_total = mileage_total {sign} {mileage}
+        WHERE {active} AND make = {make};'''
+
+
+def initialize_rollups():
+    """Create the rollup tables and the triggers that keep them in step with `fleet`.
+
+    ulez_non_compliant counts vehicles whose ULEZ flag is a charged status (auto pay
+    or manual); blank or unrecognized flags are not counted.
+    """
+    with sqlite3.connect(DB_FILE) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''CREATE TABLE IF NOT EXISTS fleet_summary (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            vehicles INTEGER NOT NULL DEFAULT 0,
+            private_vehicles INTEGER NOT NULL DEFAULT 0,
+            company_vehicles INTEGER NOT NULL DEFAULT 0,
+            ulez_non_compliant INTEGER NOT NULL DEFAULT 0,
+            mileage_total INTEGER NOT NULL DEFAULT 0
+        )''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS site_rollup (
+            site TEXT PRIMARY KEY,
+            vehicles INTEGER NOT NULL DEFAULT 0,
+            ulez_non_compliant INTEGER NOT NULL DEFAULT 0
+        )''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS make_rollup (
+            make TEXT PRIMARY KEY,
+            vehicles INTEGER NOT NULL DEFAULT 0,
+            mileage_total INTEGER NOT NULL DEFAULT 0
+        )''')
+
+        cursor.execute("DROP TRIGGER IF EXISTS fleet_rollup_insert")
+        cursor.execute(f'''CREATE TRIGGER fleet_rollup_insert AFTER INSERT ON fleet
+            BEGIN {_apply_row_sql('NEW', '+')}
+            END''')
+        cursor.execute("DROP TRIGGER IF EXISTS fleet_rollup_update")
+        cursor.execute(f'''CREATE TRIGGER fleet_rollup_update AFTER UPDATE ON fleet
+            BEGIN {_apply_row_sql('OLD', '-')} {_apply_row_sql('NEW', '+')}
+            END''')
+        cursor.execute("DROP TRIGGER IF EXISTS fleet_rollup_delete")
+        cursor.execute(f'''CREATE TRIGGER fleet_rollup_delete AFTER DELETE ON fleet
+            BEGIN {_apply_row_sql('OLD', '-')}
+            END''')
+
+        # Triggers are recreated each start, so rebuild to match their current definitions
+        _rebuild(cursor)
+        conn.commit()
+
+
+def _rebuild(cursor):
+    """Recompute every rollup from a full scan of `fleet`."""
+    cursor.execute("DELETE FROM fleet_summary")
+    cursor.execute("DELETE FROM site_rollup")
+    cursor.execute("DELETE FROM make_rollup")
+
+    active = ACTIVE.format(row='fleet')
+    private = PRIVATE.format(row='fleet')
+    charged = ULEZ_CHARGED.format(row='fleet')
+    cursor.execute(f'''INSERT INTO fleet_summary
+            (id, vehicles, private_vehicles, company_vehicles, ulez_non_compliant, mileage_total)
+        SELECT 1, COUNT(*),
+            COALESCE(SUM({private}), 0),
+            COALESCE(SUM(NOT {private}), 0),
+            COALESCE(SUM({charged}), 0),
+            COALESCE(SUM(COALESCE(mileage, 0)), 0)
+        FROM fleet WHERE {active}''')
+    cursor.execute(f'''INSERT INTO site_rollup (site, vehicles, ulez_non_compliant)
+        SELECT {SITE_KEY.format(row='fleet')}, COUNT(*), SUM({charged})
+        FROM fleet WHERE {active} GROUP BY 1''')
+    cursor.execute(f'''INSERT INTO make_rollup (make, vehicles, mileage_total)
+        SELECT {MAKE_KEY.format(row='fleet')}, COUNT(*), SUM(COALESCE(mileage, 0))
+        FROM fleet WHERE {active} GROUP BY 1''')
+
+
+def rebuild_rollups():
+    with sqlite3.connect(DB_FILE) as conn:
+        _rebuild(conn.cursor())
+        conn.commit()
+
+
+def get_fleet_summary():
+    """Headline counts for the dashboard tiles, read from the single summary row."""
+    with sqlite3.connect(DB_FILE) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''SELECT vehicles, private_vehicles, company_vehicles, ulez_non_compliant, mileage_total
+            FROM fleet_summary WHERE id = 1''')
+        row = cursor.fetchone() or (0, 0, 0, 0, 0)
+    vehicles, private_vehicles, company_vehicles, ulez_non_compliant, mileage_total = row
+    return {
+        'vehicles': vehicles,
+        'private_vehicles': private_vehicles,
+        'company_vehicles': company_vehicles,
+        'ulez_non_compliant': ulez_non_compliant,
+        'average_mileage': mileage_total / vehicles if vehicles else 0
+    }
+
+
+def get_site_counts(limit=None):
+    """Vehicles per site, largest first."""
+    query = "SELECT site, vehicles, ulez_non_compliant FROM site_rollup WHERE vehicles > 0 ORDER BY vehicles DESC"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    with sqlite3.connect(DB_FILE) as conn:
+        return conn.execute(query).fetchall()
+
+
+def get_make_mileage(limit=None):
+    """Vehicle count and average mileage per make, largest first."""
+    query = '''SELECT make, vehicles, CAST(mileage_total AS REAL) / vehicles FROM make_rollup
+        WHERE vehicles > 0 ORDER BY vehicles DESC'''
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    with sqlite3.connect(DB_FILE) as conn:
+        return conn.execute(query).fetchall()
@@ -0,0 +1,343 @@
+import hashlib
+import os
+import re
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from fleet_operations import DB_FILE
+from fleet_rollups import SITE_KEY
+
+CHUNK_SIZE = 100_000
+FUEL_PROVIDERS = ('SHELL', 'ESSO')
+PARTITION_PREFIX = "fuel_tx_"
+SPEND_TREND_FACTOR = 2.0        # Month flagged when spend exceeds this multiple of the vehicle's usual month
+COST_PER_MILE_FACTOR = 2.0      # Month flagged when cost per tracked mile exceeds this multiple of the fleet median
+
+REQUIRED_STATEMENT_COLUMNS = ('DATE', 'REGISTRATION', 'AMOUNT')
+
+# Readable text for each detect_fuel_anomalies reason
+anomaly_reasons = {
+    'private_vehicle': "Private vehicle",
+    'unknown_vehicle': "Not in fleet",
+    'spend_above_trend': "Spend above usual month",
+    'cost_per_mile': "High cost per tracked mile"
+}
+
+statement_field_mapping = {
+    'DATE': 'tx_date',
+    'REGISTRATION': 'plate_nr',
+    'CARD NUMBER': 'card_nr',
+    'SITE': 'station',
+    'PRODUCT': 'product',
+    'LITRES': 'litres',
+    'AMOUNT': 'amount'
+}
+
+
+def initialize_fuel_tables():
+    with sqlite3.connect(DB_FILE) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''CREATE TABLE IF NOT EXISTS fuel_statements (
+            file_hash TEXT PRIMARY KEY,
+            file_name TEXT,
+            provider TEXT,
+            rows_imported INTEGER,
+            imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS fuel_spend_rollup (
+            plate_nr TEXT NOT NULL,
+            site TEXT NOT NULL,
+            month TEXT NOT NULL,
+            spend REAL NOT NULL DEFAULT 0,
+            litres REAL NOT NULL DEFAULT 0,
+            fills INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (plate_nr, site, month)
+        ) WITHOUT ROWID''')
+
+        # Fold rows stored under a raw site name into the normalized site key
+        site_key = SITE_KEY.format(row='fuel_spend_rollup')
+        cursor.execute(f'''INSERT INTO fuel_spend_rollup (plate_nr, site, month, spend, litres, fills)
+            SELECT plate_nr, {site_key}, month, SUM(spend), SUM(litres), SUM(fills)
+            FROM fuel_spend_rollup WHERE site != {site_key} GROUP BY 1, 2, 3
+            ON CONFLICT (plate_nr, site, month) DO UPDATE SET
+                spend = spend + excluded.spend,
+                litres = litres + excluded.litres,
+                fills = fills + excluded.fills''')
+        cursor.execute(f"DELETE FROM fuel_spend_rollup WHERE site != {site_key}")
+        conn.commit()
+
+
+def _partition_name(month):
+    """Table holding the transactions of one month, e.g. '2025-03' -> fuel_tx_202503."""
+    return PARTITION_PREFIX + month.replace('-', '')
+
+
+def _ensure_partition(cursor, month):
+    table = _partition_name(month)
+    cursor.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY,
+        provider TEXT NOT NULL,
+        tx_date DATE NOT NULL,
+        plate_nr TEXT NOT NULL,
+        card_nr TEXT,
+        station TEXT,
+        product TEXT,
+        litres REAL,
+        amount REAL
+    )''')
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_plate ON {table} (plate_nr)")
+    return table
+
+
+def list_partitions(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE ? ORDER BY name",
+                   (PARTITION_PREFIX + '%',))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _refresh_transactions_view(conn):
+    """Recreate the `fuel_transactions` view as a UNION ALL over every monthly partition."""
+    cursor = conn.cursor()
+    cursor.execute("DROP VIEW IF EXISTS fuel_transactions")
+    partitions = list_partitions(conn)
+    if partitions:
+        union = " UNION ALL ".join(f"SELECT * FROM {table}" for table in partitions)
+        cursor.execute(f"CREATE VIEW fuel_transactions AS {union}")
+
+
+def normalize_plate(plates):
+    """Registration as matched across statements, exports and the fleet table: upper case, no spaces."""
+    return plates.astype(str).str.upper().str.replace(r'\s+', '', regex=True)
+
+
+def _load_fleet_lookup(conn):
+    """Fleet vehicles indexed by normalized plate, with the plate as stored, site and private flag."""
+    # Same site key as the dashboard rollups and charges, so per-site reports line up
+    fleet = pd.read_sql_query(f"""SELECT plate_nr, {SITE_KEY.format(row='fleet')} AS site, private, mileage
+        FROM fleet WHERE plate_nr != ''""", conn)
+    fleet['plate_key'] = normalize_plate(fleet['plate_nr'])
+    fleet['is_private'] = fleet['private'].fillna('').str.strip().str.lower().isin(['yes', 'y'])
+    return fleet.drop_duplicates('plate_key').set_index('plate_key')
+
+
+def hash_file(path):
+    """SHA-256 of a file's content, used to recognize an import that was already loaded."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _sniff_delimiter(path):
+    """Pick ';' or ',' from the statement's header line."""
+    with open(path, encoding='latin1') as f:
+        header = f.readline()
+    return ';' if header.count(';') > header.count(',') else ','
+
+
+def _parse_money(values, decimal='.'):
+    """Parse statement numbers such as '£1,234.50', '1.234,50' or '(12.00)'.
+
+    `decimal` is the decimal mark ('.' or ','); the other mark is only accepted as a
+    thousands separator in groups of three digits. Anything else, including amounts
+    that could be read either way such as '40,5' with a '.' decimal mark, becomes NaN.
+    """
+    thousands = ',' if decimal == '.' else '.'
+    t, d = re.escape(thousands), re.escape(decimal)
+    text = values.astype('string').str.strip()
+    text = text.str.replace(r'^\((.*)\)$', r'-\1', regex=True)
+    text = text.str.replace(r'[£Â$€\s]|GBP', '', regex=True)
+    valid = text.str.fullmatch(rf'-?(\d{{1,3}}({t}\d{{3}})+|\d+)({d}\d+)?').fillna(False).astype(bool)
+    text = text.str.replace(thousands, '', regex=False).str.replace(decimal, '.', regex=False)
+    return pd.to_numeric(text.where(valid), errors='coerce')
+
+
+def _prepare_chunk(chunk, provider, fleet, decimal='.'):
+    """Normalize one statement chunk; returns the usable rows and the number rejected."""
+    chunk.columns = chunk.columns.str.strip().str.upper()
+    missing = [heading for heading in REQUIRED_STATEMENT_COLUMNS if heading not in chunk.columns]
+    if missing:
+        raise ValueError("Fuel statement is missing required columns: " + ", ".join(missing))
+    chunk = chunk.rename(columns=statement_field_mapping)
+    chunk = chunk[[col for col in statement_field_mapping.values() if col in chunk.columns]].copy()
+    if 'litres' not in chunk.columns:
+        chunk['litres'] = None
+
+    chunk['tx_date'] = pd.to_datetime(chunk['tx_date'], dayfirst=True, errors='coerce')
+    litres = _parse_money(chunk['litres'], decimal)
+    amount = _parse_money(chunk['amount'], decimal)
+    # Amount is required; litres may be blank (e.g. shop items) but not unreadable
+    bad_litres = litres.isna() & chunk['litres'].notna() & (chunk['litres'].astype('string').str.strip() != '')
+    rejected = amount.isna() | bad_litres | chunk['tx_date'].isna() | chunk['plate_nr'].isna()
+    chunk['litres'] = litres.fillna(0.0).astype(float)
+    chunk['amount'] = amount.astype(float)
+    chunk = chunk[~rejected.to_numpy()]
+
+    # Link statement registrations to the plate as stored in the fleet table
+    plate_key = normalize_plate(chunk['plate_nr'])
+    chunk['plate_nr'] = plate_key.map(fleet['plate_nr']).fillna(plate_key)
+    chunk['site'] = plate_key.map(fleet['site']).fillna('UNKNOWN')
+    chunk['month'] = chunk['tx_date'].dt.strftime('%Y-%m')
+    chunk['tx_date'] = chunk['tx_date'].dt.strftime('%Y-%m-%d')
+    chunk['provider'] = provider
+
+    for col in ('card_nr', 'station', 'product'):
+        if col not in chunk.columns:
+            chunk[col] = None
+    return chunk, int(rejected.sum())
+
+
+def _update_rollups(cursor, chunk):
+    totals = (chunk.groupby(['plate_nr', 'site', 'month'], sort=False)
+              .agg(spend=('amount', 'sum'), litres=('litres', 'sum'), fills=('amount', 'size'))
+              .reset_index())
+    cursor.executemany('''INSERT INTO fuel_spend_rollup (plate_nr, site, month, spend, litres, fills)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (plate_nr, site, month) DO UPDATE SET
+            spend = spend + excluded.spend,
+            litres = litres + excluded.litres,
+            fills = fills + excluded.fills''',
+                       totals.itertuples(index=False, name=None))
+
+
+def import_fuel_statement(csv_file, provider, delimiter=None, decimal=None, chunk_size=CHUNK_SIZE):
+    """Stream a SHELL/ESSO statement CSV into the monthly partitions and update the spend rollups.
+
+    Rows with a missing or unreadable date, registration, amount or litres are
+    skipped and reported. The delimiter is detected from the header when not given,
+    and the decimal mark follows it unless given: ',' for ';' files, '.' otherwise.
+    """
+    provider = provider.strip().upper()
+    if provider not in FUEL_PROVIDERS:
+        raise ValueError(f"Unknown fuel provider {provider!r}, expected one of {FUEL_PROVIDERS}.")
+
+    initialize_fuel_tables()
+    file_hash = hash_file(csv_file)
+    columns = ['provider', 'tx_date', 'plate_nr', 'card_nr', 'station', 'product', 'litres', 'amount']
+    rows_imported = 0
+    rows_rejected = 0
+    delimiter = delimiter or _sniff_delimiter(csv_file)
+    decimal = decimal or (',' if delimiter == ';' else '.')
+
+    with sqlite3.connect(DB_FILE) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM fuel_statements WHERE file_hash = ?", (file_hash,))
+        if cursor.fetchone():
+            print(f"Statement {csv_file} has already been imported, skipping.")
+            return 0
+
+        fleet = _load_fleet_lookup(conn)
+        known_partitions = set(list_partitions(conn))
+
+        for chunk in pd.read_csv(csv_file, delimiter=delimiter, encoding='latin1',
+                                 dtype=str, chunksize=chunk_size):
+            chunk, rejected = _prepare_chunk(chunk, provider, fleet, decimal)
+            rows_rejected += rejected
+            for month, rows in chunk.groupby('month', sort=False):
+                table = _ensure_partition(cursor, month)
+                known_partitions.add(table)
+                cursor.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    rows[columns].astype(object).where(rows[columns].notnull(), None)
+                    .itertuples(index=False, name=None))
+            _update_rollups(cursor, chunk)
+            rows_imported += len(chunk)
+
+        cursor.execute('''INSERT INTO fuel_statements (file_hash, file_name, provider, rows_imported)
+            VALUES (?, ?, ?, ?)''', (file_hash, os.path.basename(csv_file), provider, rows_imported))
+        _refresh_transactions_view(conn)
+        conn.commit()
+
+    if rows_rejected:
+        print(f"{rows_rejected} fuel transactions skipped: missing or unreadable date, registration, amount or litres.")
+    print(f"{rows_imported} fuel transactions from {csv_file} imported successfully.")
+    return rows_imported
+
+
+def fuel_spend_by_vehicle(month=None):
+    """Spend, litres and fills per vehicle, optionally for a single 'YYYY-MM' month."""
+    query = "SELECT plate_nr, SUM(spend) AS spend, SUM(litres) AS litres, SUM(fills) AS fills FROM fuel_spend_rollup"
+    params = ()
+    if month:
+        query += " WHERE month = ?"
+        params = (month,)
+    query += " GROUP BY plate_nr ORDER BY spend DESC"
+    with sqlite3.connect(DB_FILE) as conn:
+        return pd.read_sql_query(query, conn, params=params)
+
+
+def fuel_spend_by_site(month=None):
+    """Spend, litres and fills per site and month, read straight from the rollup table."""
+    query = '''SELECT site, month, SUM(spend) AS spend, SUM(litres) AS litres, SUM(fills) AS fills
+        FROM fuel_spend_rollup'''
+    params = ()
+    if month:
+        query += " WHERE month = ?"
+        params = (month,)
+    query += " GROUP BY site, month ORDER BY month, site"
+    with sqlite3.connect(DB_FILE) as conn:
+        return pd.read_sql_query(query, conn, params=params)
+
+
+def _tracked_miles(conn):
+    """Telematics distance per normalized plate and month, empty if no tracker data is loaded."""
+    try:
+        return pd.read_sql_query('''SELECT plate_key, SUBSTR(day, 1, 7) AS month, SUM(distance_miles) AS miles
+            FROM telematics_daily GROUP BY plate_key, month''', conn)
+    except (sqlite3.OperationalError, pd.errors.DatabaseError):
+        return pd.DataFrame(columns=['plate_key', 'month', 'miles'])
+
+
+def detect_fuel_anomalies(spend_factor=SPEND_TREND_FACTOR, cost_per_mile_factor=COST_PER_MILE_FACTOR):
+    """Flag suspicious fuel spend using the rollup table and the fleet register.
+
+    Returns a DataFrame with one row per (plate_nr, month, reason), where reason is
+    'private_vehicle', 'unknown_vehicle', 'spend_above_trend' or 'cost_per_mile'.
+    The cost per mile check only covers months with telematics distance for the vehicle.
+    """
+    with sqlite3.connect(DB_FILE) as conn:
+        rollup = pd.read_sql_query('''SELECT plate_nr, month, SUM(spend) AS spend, SUM(litres) AS litres
+            FROM fuel_spend_rollup GROUP BY plate_nr, month''', conn)
+        fleet = _load_fleet_lookup(conn)
+        tracked = _tracked_miles(conn)
+
+    columns = ['plate_nr', 'month', 'spend', 'reason']
+    if rollup.empty:
+        return pd.DataFrame(columns=columns)
+
+    plate_key = normalize_plate(rollup['plate_nr'])
+    known = plate_key.isin(fleet.index).to_numpy()
+    is_private = plate_key.map(fleet['is_private']).fillna(False).to_numpy(dtype=bool)
+
+    # Spend against the vehicle's own usual month
+    usual_spend = rollup.groupby('plate_nr')['spend'].transform('median').to_numpy()
+    above_trend = (rollup['spend'].to_numpy() > spend_factor * usual_spend) & (usual_spend > 0)
+
+    # Spend per tracked mile in the same month against the fleet median
+    miles = (pd.DataFrame({'plate_key': plate_key, 'month': rollup['month']})
+             .merge(tracked, on=['plate_key', 'month'], how='left')['miles']
+             .fillna(0).to_numpy(dtype=float))
+    spend = rollup['spend'].to_numpy(dtype=float)
+    cost_per_mile = np.divide(spend, miles, out=np.full_like(spend, np.nan), where=miles > 0)
+    if np.isfinite(cost_per_mile).any():
+        above_cost = np.nan_to_num(cost_per_mile, nan=0.0) > cost_per_mile_factor * np.nanmedian(cost_per_mile)
+    else:
+        above_cost = np.zeros(len(rollup), dtype=bool)
+
+    flags = []
+    for reason, mask in (('private_vehicle', is_private),
+                         ('unknown_vehicle', ~known),
+                         ('spend_above_trend', above_trend),
+                         ('cost_per_mile', above_cost)):
+        if mask.any():
+            flagged = rollup.loc[mask, ['plate_nr', 'month', 'spend']].copy()
+            flagged['reason'] = reason
+            flags.append(flagged)
+
+    if not flags:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(flags, ignore_index=True).sort_values(['month', 'plate_nr']).reset_index(drop=True)
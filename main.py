@@ -1,15 +1,23 @@
 import tkinter as tk
 from dashboard import MainDashboard
 from fleet_operations import initialize_database, import_dataset_to_db
+from backup import schedule_backups
+from fuel_transactions import initialize_fuel_tables
+from telematics import initialize_telematics_tables
+from fleet_rollups import initialize_rollups
 
 
 def main():
     root = tk.Tk()
     dashboard = MainDashboard(root)
+    schedule_backups(root)
     root.mainloop()
 
 if __name__ == "__main__":
     initialize_database()
+    initialize_rollups()
+    initialize_fuel_tables()
+    initialize_telematics_tables()
     # Specify the path to your CSV file here
     import_dataset_to_db('Excel/importData.csv')
     main()
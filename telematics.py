@@ -0,0 +1,446 @@
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from fleet_operations import DB_FILE
+from fuel_transactions import hash_file, normalize_plate
+
+TELEMATICS_DIR = "telematics"
+POINTS_FILE = "points.bin"
+CHUNK_SIZE = 500_000
+DOWNSAMPLE_SECONDS = 60         # Keep at most one stored point per vehicle per interval
+MAX_GAP_SECONDS = 15 * 60       # Longer gaps between points are not counted as usage
+MOVING_SPEED_MPH = 3.0          # Minimum speed for an interval to count as usage
+EARTH_RADIUS_MILES = 3958.8
+
+# One stored GPS point, 18 bytes packed
+POINT_DTYPE = np.dtype([
+    ('vehicle_key', '<u4'),       # telematics_vehicles.vehicle_key
+    ('ts', '<u4'),              # Seconds since the Unix epoch (UTC)
+    ('lat', '<f4'),
+    ('lon', '<f4'),
+    ('speed', '<f2'),           # mph
+])
+
+export_field_mapping = {
+    'REGISTRATION': 'plate_nr',
+    'VEHICLE': 'plate_nr',
+    'TIMESTAMP': 'timestamp',
+    'LATITUDE': 'lat',
+    'LONGITUDE': 'lon',
+    'SPEED': 'speed',
+    'START TIME': 'start_time',
+    'END TIME': 'end_time',
+    'DISTANCE': 'distance'
+}
+
+
+def initialize_telematics_tables():
+    with sqlite3.connect(DB_FILE) as conn:
+        cursor = conn.cursor()
+        # Telematics data is keyed by normalized plate, not fleet.id, because emptied
+        # fleet ids are handed to the next vehicle added
+        cursor.execute('''CREATE TABLE IF NOT EXISTS telematics_vehicles (
+            vehicle_key INTEGER PRIMARY KEY,
+            plate_key TEXT NOT NULL UNIQUE
+        )''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS telematics_exports (
+            file_hash TEXT PRIMARY KEY,
+            file_name TEXT,
+            rows_imported INTEGER,
+            imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS telematics_daily (
+            plate_key TEXT NOT NULL,
+            day DATE NOT NULL,
+            distance_miles REAL NOT NULL DEFAULT 0,
+            usage_seconds INTEGER NOT NULL DEFAULT 0,
+            points INTEGER NOT NULL DEFAULT 0,
+            trips INTEGER NOT NULL DEFAULT 0,
+            first_seen INTEGER,
+            last_seen INTEGER,
+            PRIMARY KEY (plate_key, day)
+        ) WITHOUT ROWID''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS telematics_trips (
+            plate_key TEXT NOT NULL,
+            start_time INTEGER NOT NULL,
+            end_time INTEGER NOT NULL,
+            day DATE NOT NULL,
+            distance_miles REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (plate_key, start_time)
+        ) WITHOUT ROWID''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS telematics_mileage_sync (
+            plate_key TEXT PRIMARY KEY,
+            miles_applied REAL NOT NULL DEFAULT 0
+        )''')
+        conn.commit()
+
+
+def _points_path(store_dir=TELEMATICS_DIR):
+    return os.path.join(store_dir, POINTS_FILE)
+
+
+def _haversine_miles(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(a.astype(np.float64)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+
+def _epoch_seconds(timestamps):
+    return (timestamps - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+
+
+def _load_plate_lookup(cursor):
+    """Map normalized plates of vehicles currently in the fleet to their telematics keys."""
+    cursor.execute("SELECT plate_nr FROM fleet WHERE plate_nr != ''")
+    plate_keys = normalize_plate(pd.Series([row[0] for row in cursor.fetchall()], dtype=object)).unique()
+    cursor.executemany("INSERT OR IGNORE INTO telematics_vehicles (plate_key) VALUES (?)",
+                       [(key,) for key in plate_keys])
+    cursor.execute("SELECT plate_key, vehicle_key FROM telematics_vehicles")
+    registry = dict(cursor.fetchall())
+    return pd.Series({key: registry[key] for key in plate_keys}, dtype='int64')
+
+
+def vehicle_keys_for_plates(plates):
+    """Telematics keys aligned with `plates`, 0 where a plate has never been tracked."""
+    initialize_telematics_tables()
+    with sqlite3.connect(DB_FILE) as conn:
+        registry = pd.read_sql_query("SELECT plate_key, vehicle_key FROM telematics_vehicles", conn)
+    lookup = pd.Series(registry['vehicle_key'].to_numpy(), index=registry['plate_key'])
+    return normalize_plate(pd.Series(plates, dtype=object)).map(lookup).fillna(0).to_numpy(dtype=np.int64)
+
+
+def _first_byte(path):
+    """First non-whitespace byte of a file, ignoring a UTF-8 byte order mark."""
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(4096), b''):
+            stripped = block.lstrip(b'\xef\xbb\xbf \t\r\n')
+            if stripped:
+                return stripped[:1]
+    return b''
+
+
+def _read_export(path, chunk_size):
+    """Yield DataFrame chunks from a CSV, JSON Lines or JSON array export."""
+    first = _first_byte(path)
+    if first == b'[':
+        # A JSON array cannot be streamed, read it whole
+        yield pd.read_json(path, orient='records')
+    elif first == b'{':
+        yield from pd.read_json(path, lines=True, chunksize=chunk_size)
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def _normalize_chunk(chunk, plates):
+    chunk.columns = chunk.columns.astype(str).str.strip().str.upper()
+    chunk = chunk.rename(columns=export_field_mapping)
+
+    columns = set(chunk.columns)
+    if 'start_time' in columns:
+        missing = {'plate_nr', 'start_time', 'end_time', 'distance'} - columns
+    else:
+        missing = {'plate_nr', 'timestamp', 'lat', 'lon'} - columns
+    if missing:
+        names = {}
+        for heading, field in export_field_mapping.items():
+            names.setdefault(field, heading)
+        raise ValueError("Telematics export is missing required columns: "
+                         + ", ".join(sorted(names[field] for field in missing)))
+
+    keys = normalize_plate(chunk['plate_nr'])
+    chunk['plate_key'] = keys
+    chunk['vehicle_key'] = keys.map(plates)
+    return chunk
+
+
+def _points_from_chunk(chunk):
+    ts = pd.to_datetime(chunk['timestamp'], errors='coerce', utc=True)
+    lat = pd.to_numeric(chunk['lat'], errors='coerce')
+    lon = pd.to_numeric(chunk['lon'], errors='coerce')
+    valid = ts.notna() & lat.notna() & lon.notna() & chunk['vehicle_key'].notna()
+    points = np.empty(int(valid.sum()), dtype=POINT_DTYPE)
+    points['vehicle_key'] = chunk.loc[valid, 'vehicle_key'].to_numpy(dtype=np.uint32)
+    points['ts'] = _epoch_seconds(ts[valid]).to_numpy(dtype=np.uint32)
+    points['lat'] = lat[valid].to_numpy(dtype=np.float32)
+    points['lon'] = lon[valid].to_numpy(dtype=np.float32)
+    speed = chunk['speed'] if 'speed' in chunk.columns else pd.Series(np.nan, index=chunk.index)
+    points['speed'] = pd.to_numeric(speed[valid], errors='coerce').to_numpy(dtype=np.float16)
+    return np.sort(points, order=['vehicle_key', 'ts'])
+
+
+def _summarize_points(points):
+    """Per vehicle/day distance and usage from points sorted by vehicle and time."""
+    same_vehicle = points['vehicle_key'][1:] == points['vehicle_key'][:-1]
+    dt = points['ts'][1:].astype(np.int64) - points['ts'][:-1].astype(np.int64)
+    dist = _haversine_miles(points['lat'][:-1], points['lon'][:-1], points['lat'][1:], points['lon'][1:])
+    counted = same_vehicle & (dt > 0) & (dt <= MAX_GAP_SECONDS)
+    speed = np.where(np.isnan(points['speed'][1:]), dist / np.maximum(dt, 1) * 3600,
+                     points['speed'][1:].astype(np.float64))
+    moving = counted & (speed >= MOVING_SPEED_MPH)
+
+    # Each interval is credited to the day of its end point
+    end = points[1:]
+    intervals = pd.DataFrame({
+        'vehicle_key': end['vehicle_key'],
+        'day': pd.to_datetime(end['ts'], unit='s').strftime('%Y-%m-%d'),
+        'distance_miles': np.where(counted, dist, 0.0),
+        'usage_seconds': np.where(moving, dt, 0),
+    })
+    distance = intervals.groupby(['vehicle_key', 'day'])[['distance_miles', 'usage_seconds']].sum()
+
+    raw = pd.DataFrame({
+        'vehicle_key': points['vehicle_key'],
+        'day': pd.to_datetime(points['ts'], unit='s').strftime('%Y-%m-%d'),
+        'ts': points['ts'].astype(np.int64),
+    })
+    seen = raw.groupby(['vehicle_key', 'day'])['ts'].agg(points='size', first_seen='min', last_seen='max')
+    return seen.join(distance, how='left').fillna({'distance_miles': 0.0, 'usage_seconds': 0}).reset_index()
+
+
+def downsample_points(points, interval=DOWNSAMPLE_SECONDS):
+    """Keep the first point of each vehicle in every `interval`-second bucket."""
+    if len(points) == 0:
+        return points
+    bucket = points['ts'] // interval
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:] = (points['vehicle_key'][1:] != points['vehicle_key'][:-1]) | (bucket[1:] != bucket[:-1])
+    return points[keep]
+
+
+def _bucket_keys(points, interval=DOWNSAMPLE_SECONDS):
+    """One integer per (vehicle_key, downsample bucket) pair."""
+    buckets = (points['ts'] // interval).astype(np.uint64)
+    return (points['vehicle_key'].astype(np.uint64) << np.uint64(32)) | buckets
+
+
+def _new_points(points, store_dir, interval=DOWNSAMPLE_SECONDS):
+    """Downsample sorted points and drop those whose vehicle and bucket are already stored.
+
+    Overlapping exports therefore never store the same vehicle and minute twice.
+    """
+    points = downsample_points(points, interval)
+    if len(points) == 0:
+        return points
+    start = int(points['ts'].min()) // interval * interval
+    stored = load_points(start=start, end=int(points['ts'].max()) + interval, store_dir=store_dir)
+    if len(stored) == 0:
+        return points
+    return points[~np.isin(_bucket_keys(points, interval), _bucket_keys(stored, interval))]
+
+
+def _append_points(points, store_dir):
+    os.makedirs(store_dir, exist_ok=True)
+    with open(_points_path(store_dir), 'ab') as f:
+        points.tofile(f)
+
+
+def _point_days(points, plate_keys):
+    """(plate_key, day) pairs covered by a batch of points."""
+    return pd.DataFrame({
+        'plate_key': pd.Series(points['vehicle_key'].astype(np.int64)).map(plate_keys),
+        'day': pd.to_datetime(points['ts'], unit='s').strftime('%Y-%m-%d'),
+    }).drop_duplicates()
+
+
+def _insert_trips(cursor, chunk):
+    """Store trip rows once per plate and start time; returns the (plate_key, day) pairs touched."""
+    start = pd.to_datetime(chunk['start_time'], errors='coerce', utc=True)
+    end = pd.to_datetime(chunk['end_time'], errors='coerce', utc=True)
+    valid = start.notna() & end.notna() & chunk['vehicle_key'].notna()
+    trips = pd.DataFrame({
+        'plate_key': chunk.loc[valid, 'plate_key'],
+        'start_time': _epoch_seconds(start[valid]),
+        'end_time': _epoch_seconds(end[valid]),
+        'day': end[valid].dt.strftime('%Y-%m-%d'),
+        'distance_miles': pd.to_numeric(chunk.loc[valid, 'distance'], errors='coerce').fillna(0.0),
+    })
+    cursor.executemany("""INSERT OR IGNORE INTO telematics_trips
+            (plate_key, start_time, end_time, day, distance_miles) VALUES (?, ?, ?, ?, ?)""",
+                       trips.astype(object).itertuples(index=False, name=None))
+    return trips[['plate_key', 'day']].drop_duplicates()
+
+
+def _daily_from_trips(cursor, affected):
+    keys = list(affected['plate_key'].unique())
+    cursor.execute(f"""SELECT plate_key, day, SUM(distance_miles), SUM(MAX(end_time - start_time, 0)),
+            COUNT(*), MIN(start_time), MAX(end_time)
+        FROM telematics_trips
+        WHERE day BETWEEN ? AND ? AND plate_key IN ({', '.join('?' * len(keys))})
+        GROUP BY plate_key, day""", [affected['day'].min(), affected['day'].max()] + keys)
+    return pd.DataFrame(cursor.fetchall(), columns=['plate_key', 'day', 'trip_miles', 'trip_seconds',
+                                                    'trips', 'trip_first', 'trip_last'])
+
+
+def _daily_from_points(affected, plates, store_dir):
+    first_day = pd.Timestamp(affected['day'].min(), tz='UTC')
+    last_day = pd.Timestamp(affected['day'].max(), tz='UTC')
+    # Start one gap early so the first interval of the first day is still counted
+    points = load_points(start=max(int(first_day.timestamp()) - MAX_GAP_SECONDS, 0),
+                         end=int(last_day.timestamp()) + 86400, store_dir=store_dir)
+    points = points[np.isin(points['vehicle_key'], plates.reindex(affected['plate_key'].unique()).dropna())]
+    daily = _summarize_points(np.sort(points, order=['vehicle_key', 'ts']))
+    daily['plate_key'] = daily['vehicle_key'].map(pd.Series(plates.index, index=plates.to_numpy()))
+    return daily.drop(columns='vehicle_key')
+
+
+def _recompute_daily(cursor, affected, plates, store_dir):
+    """Rebuild the telematics_daily rows of the given (plate_key, day) pairs from the stored data.
+
+    Distance and usage come from the stored points when the day has any, otherwise
+    from the stored trips, so re-importing overlapping data never counts it twice.
+    """
+    affected = affected.dropna().drop_duplicates()
+    if affected.empty:
+        return
+
+    daily = (affected
+             .merge(_daily_from_points(affected, plates, store_dir), on=['plate_key', 'day'], how='left')
+             .merge(_daily_from_trips(cursor, affected), on=['plate_key', 'day'], how='left'))
+    has_points = daily['points'].fillna(0) > 0
+    daily['distance_miles'] = daily['distance_miles'].where(has_points, daily['trip_miles']).fillna(0.0)
+    daily['usage_seconds'] = daily['usage_seconds'].where(has_points, daily['trip_seconds']).fillna(0)
+    daily['points'] = daily['points'].fillna(0)
+    daily['trips'] = daily['trips'].fillna(0)
+    daily['first_seen'] = daily[['first_seen', 'trip_first']].min(axis=1)
+    daily['last_seen'] = daily[['last_seen', 'trip_last']].max(axis=1)
+    daily = daily[has_points | (daily['trips'] > 0)]
+
+    cursor.executemany("DELETE FROM telematics_daily WHERE plate_key = ? AND day = ?",
+                       affected[['plate_key', 'day']].itertuples(index=False, name=None))
+    cursor.executemany('''INSERT INTO telematics_daily
+            (plate_key, day, distance_miles, usage_seconds, points, trips, first_seen, last_seen)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                       [(row.plate_key, row.day, float(row.distance_miles), int(row.usage_seconds),
+                         int(row.points), int(row.trips), int(row.first_seen), int(row.last_seen))
+                        for row in daily.itertuples(index=False)])
+
+
+def import_telematics_export(path, store_dir=TELEMATICS_DIR, chunk_size=CHUNK_SIZE):
+    """Stream a Quartix position or trip export (CSV, JSON Lines or JSON array) into the telematics store.
+
+    Position rows (REGISTRATION, TIMESTAMP, LATITUDE, LONGITUDE[, SPEED]) are downsampled
+    into the points file, skipping any vehicle and minute already stored; trip rows
+    (REGISTRATION, START TIME, END TIME, DISTANCE) are stored once per plate and start
+    time. The daily summaries of every day the export touches are then recomputed from
+    the stored data, so exports with overlapping date ranges are not counted twice.
+    An export already imported (same content) is skipped. The whole file is imported in
+    one transaction, and on failure the points file is cut back to its previous size,
+    so a failed import can simply be re-run. Returns the number of rows that matched a
+    fleet vehicle.
+    """
+    initialize_telematics_tables()
+    file_hash = hash_file(path)
+    points_path = _points_path(store_dir)
+    matched = 0
+    skipped = 0
+    affected = []
+
+    with sqlite3.connect(DB_FILE) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM telematics_exports WHERE file_hash = ?", (file_hash,))
+        if cursor.fetchone():
+            print(f"Telematics export {path} has already been imported, skipping.")
+            return 0
+
+        plates = _load_plate_lookup(cursor)
+        plate_keys = pd.Series(plates.index, index=plates.to_numpy())
+        points_size = os.path.getsize(points_path) if os.path.exists(points_path) else 0
+
+        try:
+            for chunk in _read_export(path, chunk_size):
+                chunk = _normalize_chunk(chunk, plates)
+                known = int(chunk['vehicle_key'].notna().sum())
+                matched += known
+                skipped += len(chunk) - known
+
+                if 'start_time' in chunk.columns:
+                    affected.append(_insert_trips(cursor, chunk))
+                else:
+                    points = _points_from_chunk(chunk)
+                    affected.append(_point_days(points, plate_keys))
+                    _append_points(_new_points(points, store_dir), store_dir)
+
+            if affected:
+                _recompute_daily(cursor, pd.concat(affected, ignore_index=True), plates, store_dir)
+            cursor.execute("INSERT INTO telematics_exports (file_hash, file_name, rows_imported) VALUES (?, ?, ?)",
+                           (file_hash, os.path.basename(path), matched))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            if os.path.exists(points_path):
+                with open(points_path, 'r+b') as f:
+                    f.truncate(points_size)
+            raise
+
+    if skipped:
+        print(f"{skipped} telematics rows skipped: registration not found in fleet.")
+    print(f"{matched} telematics rows from {path} imported successfully.")
+    return matched
+
+
+def load_points(vehicle_key=None, start=None, end=None, store_dir=TELEMATICS_DIR):
+    """Return stored points, optionally filtered by telematics key and epoch-second range.
+
+    The points file is memory-mapped, so only the matching rows are copied into memory.
+    """
+    path = _points_path(store_dir)
+    if not os.path.exists(path) or os.path.getsize(path) < POINT_DTYPE.itemsize:
+        return np.empty(0, dtype=POINT_DTYPE)
+
+    points = np.memmap(path, dtype=POINT_DTYPE, mode='r')
+    mask = np.ones(len(points), dtype=bool)
+    if vehicle_key is not None:
+        mask &= points['vehicle_key'] == vehicle_key
+    if start is not None:
+        mask &= points['ts'] >= start
+    if end is not None:
+        mask &= points['ts'] < end
+    return np.array(points[mask])
+
+
+def daily_summary(plate_nr=None, start_day=None, end_day=None):
+    """Per-vehicle daily distance and usage, read from the summary table."""
+    query = "SELECT * FROM telematics_daily WHERE 1=1"
+    params = []
+    if plate_nr is not None:
+        query += " AND plate_key = ?"
+        params.append(normalize_plate(pd.Series([plate_nr]))[0])
+    if start_day:
+        query += " AND day >= ?"
+        params.append(start_day)
+    if end_day:
+        query += " AND day <= ?"
+        params.append(end_day)
+    query += " ORDER BY plate_key, day"
+    with sqlite3.connect(DB_FILE) as conn:
+        return pd.read_sql_query(query, conn, params=params)
+
+
+def update_fleet_mileage():
+    """Add tracked distance not yet applied to each vehicle's `mileage` column."""
+    initialize_telematics_tables()
+    with sqlite3.connect(DB_FILE) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''SELECT d.plate_key, SUM(d.distance_miles) - COALESCE(s.miles_applied, 0)
+            FROM telematics_daily d
+            LEFT JOIN telematics_mileage_sync s ON s.plate_key = d.plate_key
+            GROUP BY d.plate_key''')
+        pending = {key: int(miles) for key, miles in cursor.fetchall() if miles and int(miles) > 0}
+
+        fleet = pd.read_sql_query("SELECT id, plate_nr FROM fleet WHERE plate_nr != ''", conn)
+        fleet['plate_key'] = normalize_plate(fleet['plate_nr'])
+        fleet = fleet[fleet['plate_key'].isin(pending.keys())]
+        applied = {key: pending[key] for key in fleet['plate_key'].unique()}
+
+        cursor.executemany("UPDATE fleet SET mileage = COALESCE(mileage, 0) + ? WHERE id = ?",
+                           [(applied[key], int(vid)) for vid, key in zip(fleet['id'], fleet['plate_key'])])
+        cursor.executemany('''INSERT INTO telematics_mileage_sync (plate_key, miles_applied) VALUES (?, ?)
+            ON CONFLICT (plate_key) DO UPDATE SET miles_applied = miles_applied + excluded.miles_applied''',
+                           list(applied.items()))
+        conn.commit()
+
+    print(f"Mileage updated for {len(applied)} vehicles from telematics data.")
+    return len(applied)